@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import errno
+import functools
 import os
 import re
-import shutil
 import socket
-import subprocess
+import string
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 DEFAULT_WHOIS_SERVER = "whois.nic.ai"
 HEADER_HINTS = {"word", "words", "name", "domain", "domains"}
+LABEL_CHARS = frozenset(string.ascii_lowercase + string.digits + "-")
 AVAILABLE_MARKERS = [
     "NO OBJECT FOUND",
     "NOT FOUND",
@@ -33,6 +37,11 @@ TAKEN_REGEXES = [
     r"\bREGISTRAR\s*:",
     r"\bNAME\s+SERVER\s*:",
 ]
+# Matched against an uppercased response: case-sensitive patterns keep
+# CPython's literal fast paths that re.IGNORECASE disables.
+AVAILABLE_RE = re.compile("|".join(f"(?:{p})" for p in AVAILABLE_REGEXES))
+TAKEN_RE = re.compile("|".join(f"(?:{p})" for p in TAKEN_REGEXES))
+CLASSIFY_HEAD_LINES = 32
 THROTTLE_MARKERS = [
     "WHOIS LIMIT EXCEEDED",
     "QUERY LIMIT EXCEEDED",
@@ -47,6 +56,22 @@ THROTTLE_ERROR_HINTS = [
     "EXCESSIVE",
     "THROTTLE",
 ]
+TRANSIENT_ERROR_HINTS = [
+    "RESET BY PEER",
+    "CONNECTION ABORT",
+    "BROKEN PIPE",
+]
+THROTTLE_REASON_RE = re.compile(
+    "|".join(map(re.escape, THROTTLE_MARKERS + THROTTLE_ERROR_HINTS)), re.IGNORECASE
+)
+TRANSIENT_ERROR_RE = re.compile(
+    "|".join(map(re.escape, TRANSIENT_ERROR_HINTS)), re.IGNORECASE
+)
+CSV_QUOTE_RE = re.compile(r'[",\r\n]')
+OUTPUT_BUFFER = 1 << 16
+RECV_BUFFER = 1 << 16
+ADDRINFO_TTL = 300.0
+_ADDRINFO_CACHE = {}
 
 
 def iter_words(csv_path, column, no_header):
@@ -82,18 +107,39 @@ def iter_words(csv_path, column, no_header):
                     yield row_idx, value
             return
 
-        reader = csv.DictReader(handle)
-        if not reader.fieldnames or column not in reader.fieldnames:
-            available = ", ".join(reader.fieldnames or [])
+        reader = csv.reader(handle)
+        fieldnames = next(reader, None)
+        if not fieldnames or column not in fieldnames:
+            available = ", ".join(fieldnames or [])
             raise ValueError(
                 f"Column '{column}' not found. Available: {available or 'none'}"
             )
-        for row_idx, row in enumerate(reader, start=2):
-            value = (row.get(column) or "").strip()
+        # Match DictReader: the last duplicate header wins and blank rows
+        # are not counted, so existing checkpoints keep their row numbers.
+        col_idx = len(fieldnames) - 1 - fieldnames[::-1].index(column)
+        row_idx = 1
+        for row in reader:
+            if not row:
+                continue
+            row_idx += 1
+            if col_idx >= len(row):
+                continue
+            value = row[col_idx].strip()
             if value:
                 yield row_idx, value
 
 
+def csv_field(value):
+    if CSV_QUOTE_RE.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def format_row(word, domain, status, reason):
+    return f"{csv_field(word)},{csv_field(domain)},{status},{csv_field(reason)}\r\n"
+
+
+@functools.lru_cache(maxsize=65536)
 def is_valid_label(label):
     if not label:
         return False, "empty label"
@@ -101,14 +147,25 @@ def is_valid_label(label):
         return False, "label too long"
     if label.startswith("-") or label.endswith("-"):
         return False, "label starts or ends with '-'"
-    if not re.fullmatch(r"[a-z0-9-]+", label):
+    if not LABEL_CHARS.issuperset(label):
         return False, "invalid characters"
     return True, ""
 
 
+def resolve_whois_server(server, family):
+    key = (server, family)
+    now = time.monotonic()
+    cached = _ADDRINFO_CACHE.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    addrinfos = socket.getaddrinfo(server, 43, family, socket.SOCK_STREAM)
+    _ADDRINFO_CACHE[key] = (now + ADDRINFO_TTL, addrinfos)
+    return addrinfos
+
+
 def query_whois_socket(domain, server, timeout, family):
     try:
-        addrinfos = socket.getaddrinfo(server, 43, family, socket.SOCK_STREAM)
+        addrinfos = resolve_whois_server(server, family)
     except Exception as exc:
         return "", str(exc)
     last_error = ""
@@ -116,21 +173,26 @@ def query_whois_socket(domain, server, timeout, family):
     for af, socktype, proto, _, sockaddr in addrinfos:
         try:
             with socket.socket(af, socktype, proto) as sock:
+                deadline = time.monotonic() + timeout
                 sock.settimeout(timeout)
                 sock.connect(sockaddr)
                 sock.sendall((domain + "\r\n").encode("ascii"))
                 sock.shutdown(socket.SHUT_WR)
-                chunks = []
+                data = bytearray()
                 while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    sock.settimeout(remaining)
                     try:
-                        data = sock.recv(4096)
+                        chunk = sock.recv(RECV_BUFFER)
                     except socket.timeout:
                         break
-                    if not data:
+                    if not chunk:
                         break
-                    chunks.append(data)
-            if chunks:
-                return b"".join(chunks).decode("utf-8", errors="replace"), ""
+                    data += chunk
+            if data:
+                return data.decode("utf-8", errors="replace"), ""
             saw_empty = True
         except Exception as exc:
             last_error = str(exc)
@@ -140,58 +202,76 @@ def query_whois_socket(domain, server, timeout, family):
 
 
 def query_whois_netcat(domain, server, timeout):
-    if not shutil.which("nc"):
-        return "", "nc not found"
-    timeout_arg = str(max(1, int(round(timeout))))
+    # Same exchange as `nc -w N server 43`: any address family and a
+    # whole-second timeout, without forking a process per query.
+    response, error = query_whois_socket(domain, server, max(1, int(round(timeout))), 0)
+    if error.endswith(os.strerror(errno.ECONNREFUSED)):
+        # nc exits 1 when the server refuses the connection, which this
+        # script has always treated as throttling.
+        return "", "nc exit 1"
+    return response, error
+
+
+def query_dns(domain):
+    # Trailing dot: never expand through the resolv.conf search list, where a
+    # wildcard record would make every name look taken.
     try:
-        result = subprocess.run(
-            ["nc", "-w", timeout_arg, server, "43"],
-            input=domain + "\r\n",
-            text=True,
-            capture_output=True,
-            timeout=timeout + 2,
-            check=False,
-        )
-    except Exception as exc:
-        return "", str(exc)
-    stdout = result.stdout or ""
-    stderr = result.stderr or ""
-    if result.returncode != 0:
-        return "", stderr.strip() or stdout.strip() or f"nc exit {result.returncode}"
-    if not stdout.strip() and stderr.strip():
-        return "", stderr.strip()
-    return stdout, ""
+        socket.getaddrinfo(domain + ".", None, 0, socket.SOCK_STREAM)
+    except OSError:
+        return False
+    return True
 
 
-def classify_response(response):
-    head = "\n".join(response.splitlines()[:8])
-    for pattern in AVAILABLE_REGEXES:
-        if re.search(pattern, head, re.IGNORECASE):
-            return "available", "domain not found"
-    upper = response.upper()
+def head_end(response, lines):
+    end = -1
+    for _ in range(lines):
+        end = response.find("\n", end + 1)
+        if end == -1:
+            return len(response)
+    return end
+
+
+def response_head(response, lines=8):
+    return response[: head_end(response, lines)]
+
+
+def match_markers(upper, start, end):
     for marker in AVAILABLE_MARKERS:
-        if marker in upper:
+        if upper.find(marker, start, end) != -1:
             return "available", marker
     for marker in THROTTLE_MARKERS:
-        if marker in upper:
+        if upper.find(marker, start, end) != -1:
             return "error", marker
-    for pattern in TAKEN_REGEXES:
-        if re.search(pattern, response, re.IGNORECASE):
-            return "taken", "WHOIS record found"
+    if TAKEN_RE.search(upper, start, end):
+        return "taken", "WHOIS record found"
+    return None
+
+
+def classify_response(response):
+    upper = response.upper()
+    if AVAILABLE_RE.search(upper, 0, head_end(upper, 8)):
+        return "available", "domain not found"
+    # The verdict is almost always in the first lines; only scan the rest
+    # of the response when they do not decide it.
+    end = head_end(upper, CLASSIFY_HEAD_LINES)
+    verdict = match_markers(upper, 0, end)
+    if verdict is None and end < len(upper):
+        verdict = match_markers(upper, end, len(upper))
+    if verdict is not None:
+        return verdict
     if "TERMS OF USE" in upper and "DOMAIN NAME" not in upper:
         return "error", "terms-only response"
     return "error", "ambiguous response"
 
 
 def is_throttle_reason(reason):
-    upper = reason.upper()
-    for marker in THROTTLE_MARKERS:
-        if marker in upper:
-            return True
-    for hint in THROTTLE_ERROR_HINTS:
-        if hint in upper:
-            return True
-    return False
+    return THROTTLE_REASON_RE.search(reason) is not None
+
+
+def retry_delay(error, attempt, retry_sleep):
+    if attempt == 0 and TRANSIENT_ERROR_RE.search(error):
+        return 0.0
+    return retry_sleep
 
 
 def load_checkpoint(path):
@@ -210,11 +290,19 @@ def load_checkpoint(path):
     return row_idx
 
 
-def save_checkpoint(path, row_idx, word):
+def open_checkpoint(path):
     if not path:
+        return None
+    return os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+")
+
+
+def save_checkpoint(handle, row_idx, word):
+    if handle is None:
         return
-    with open(path, "w") as handle:
-        handle.write(f"{row_idx},{word}\n")
+    handle.seek(0)
+    handle.write(f"{row_idx},{word}\n")
+    handle.truncate()
+    handle.flush()
 
 
 def check_domain(
@@ -226,21 +314,26 @@ def check_domain(
     debug,
     mode,
     ipv4,
+    stop=None,
 ):
     last_error = ""
     for attempt in range(retries + 1):
+        if stop is not None and stop.is_set():
+            return "error", "interrupted"
         response = ""
         error = ""
         if mode in ("socket", "auto"):
             family = socket.AF_INET if ipv4 else 0
             response, error = query_whois_socket(domain, server, timeout, family)
         if mode in ("netcat", "auto") and not response.strip():
+            if stop is not None and stop.is_set():
+                return "error", "interrupted"
             response, error = query_whois_netcat(domain, server, timeout)
 
         if response.strip():
             status, reason = classify_response(response)
             if status == "error" and debug:
-                head = "\n".join(response.splitlines()[:8])
+                head = response_head(response)
                 print(
                     f"[debug] {domain} response head:\n{head}",
                     file=sys.stderr,
@@ -256,10 +349,106 @@ def check_domain(
                 file=sys.stderr,
             )
         if attempt < retries:
-            time.sleep(retry_sleep)
+            delay = retry_delay(last_error, attempt, retry_sleep)
+            if delay > 0:
+                if stop is None:
+                    time.sleep(delay)
+                else:
+                    stop.wait(delay)
     return "error", last_error
 
 
+def lookup_domain(domain, args, sleep_before, current_sleep, stop=None):
+    if args.probe == "dns" and query_dns(domain):
+        return "taken", "DNS record found", current_sleep
+    throttle_attempts = 0
+    while True:
+        if sleep_before and current_sleep > 0:
+            if stop is None:
+                time.sleep(current_sleep)
+            else:
+                stop.wait(current_sleep)
+        # Pool workers are not interrupted by Ctrl-C; main sets stop instead.
+        if stop is not None and stop.is_set():
+            return "error", "interrupted", current_sleep
+        status, reason = check_domain(
+            domain,
+            args.server,
+            args.timeout,
+            args.retries,
+            args.retry_sleep,
+            args.debug,
+            args.mode,
+            args.ipv4,
+            stop,
+        )
+        if status == "error" and is_throttle_reason(reason):
+            throttle_attempts += 1
+            if throttle_attempts > args.throttle_retries:
+                return "error", "throttled", current_sleep
+            current_sleep = min(
+                args.max_sleep,
+                max(current_sleep * args.backoff_factor, args.sleep),
+            )
+            if args.debug:
+                print(
+                    f"[debug] throttled {domain}, sleeping {current_sleep}s",
+                    file=sys.stderr,
+                )
+            sleep_before = True
+            continue
+        return status, reason, args.sleep
+
+
+def lookup_batch(executor, domains, args, sleep_before, current_sleep, stop):
+    if executor is None:
+        outcomes = [
+            lookup_domain(domain, args, sleep_before, current_sleep)
+            for domain in domains
+        ]
+    else:
+        futures = [
+            executor.submit(
+                lookup_domain, domain, args, sleep_before, current_sleep, stop
+            )
+            for domain in domains
+        ]
+        outcomes = [future.result() for future in futures]
+    results = {}
+    next_sleep = 0.0
+    for domain, (status, reason, domain_sleep) in zip(domains, outcomes):
+        results[domain] = (status, reason)
+        next_sleep = max(next_sleep, domain_sleep)
+    return results, next_sleep
+
+
+def iter_batches(words, cache, size):
+    batch = []
+    pending = {}
+    for row_idx, word in words:
+        label = word.lower()
+        if label in cache:
+            domain, result = cache[label]
+            batch.append((row_idx, word, domain, result))
+            continue
+        valid, reason = is_valid_label(label)
+        domain = f"{label}.ai" if label else ".ai"
+        if not valid:
+            result = ("error", reason)
+            cache[label] = (domain, result)
+            batch.append((row_idx, word, domain, result))
+            continue
+        batch.append((row_idx, word, domain, None))
+        if domain not in pending:
+            pending[domain] = label
+            if len(pending) >= size:
+                yield batch, pending
+                batch = []
+                pending = {}
+    if batch:
+        yield batch, pending
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Check .ai domain availability using a CSV list of words."
@@ -330,7 +519,15 @@ def main():
         "--mode",
         choices=("auto", "socket", "netcat"),
         default="auto",
-        help="WHOIS query mode (default: auto)",
+        help="WHOIS query mode; netcat retries over any address family "
+        "(default: auto)",
+    )
+    parser.add_argument(
+        "--probe",
+        choices=("whois", "dns"),
+        default="whois",
+        help="Check DNS first and only query WHOIS when the domain does not "
+        "resolve (default: whois)",
     )
     parser.add_argument(
         "--ipv4",
@@ -346,12 +543,28 @@ def main():
         default=".whois_checkpoint",
         help="Checkpoint file path (default: .whois_checkpoint)",
     )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=50,
+        help="Flush output and save the checkpoint every N rows (default: 50)",
+    )
     parser.add_argument(
         "--resume",
         action="store_true",
         help="Resume after the last checkpoint row",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of WHOIS queries to run in parallel (default: 1)",
+    )
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.checkpoint_every < 1:
+        parser.error("--checkpoint-every must be at least 1")
 
     last_row_idx = None
     if args.resume and args.checkpoint:
@@ -368,72 +581,55 @@ def main():
     output_has_data = output_exists and os.path.getsize(args.output) > 0
     if args.output:
         out_mode = "a" if args.resume and output_exists else "w"
-        out_handle = open(args.output, out_mode, newline="")
+        out_handle = open(args.output, out_mode, newline="", buffering=OUTPUT_BUFFER)
         close_out = True
 
-    writer = csv.writer(out_handle)
     if not (args.output and args.resume and output_has_data):
-        writer.writerow(["word", "domain", "status", "reason"])
+        out_handle.write("word,domain,status,reason\r\n")
+
+    words = iter_words(args.csv_path, args.column, args.no_header)
+    if last_row_idx is not None:
+        words = ((row_idx, word) for row_idx, word in words if row_idx > last_row_idx)
 
     cache = {}
     first = True
     current_sleep = args.sleep
+    checkpoint = open_checkpoint(args.checkpoint)
+    last_row = None
+    unsaved_rows = 0
+    stop = threading.Event()
+    executor = None
+    if args.concurrency > 1:
+        executor = ThreadPoolExecutor(max_workers=args.concurrency)
     try:
-        for row_idx, word in iter_words(args.csv_path, args.column, args.no_header):
-            if last_row_idx is not None and row_idx <= last_row_idx:
-                continue
-            label = word.strip().lower()
-            valid, reason = is_valid_label(label)
-            domain = f"{label}.ai" if label else ".ai"
-            if not valid:
-                writer.writerow([word, domain, "error", reason])
-                save_checkpoint(args.checkpoint, row_idx, word)
-                continue
-
-            if domain in cache:
-                status, reason = cache[domain]
-            else:
-                throttle_attempts = 0
-                sleep_before = not first
-                while True:
-                    if sleep_before and current_sleep > 0:
-                        time.sleep(current_sleep)
-                    status, reason = check_domain(
-                        domain,
-                        args.server,
-                        args.timeout,
-                        args.retries,
-                        args.retry_sleep,
-                        args.debug,
-                        args.mode,
-                        args.ipv4,
-                    )
-                    if status == "error" and is_throttle_reason(reason):
-                        throttle_attempts += 1
-                        if throttle_attempts > args.throttle_retries:
-                            status, reason = "error", "throttled"
-                            break
-                        current_sleep = min(
-                            args.max_sleep,
-                            max(current_sleep * args.backoff_factor, args.sleep),
-                        )
-                        if args.debug:
-                            print(
-                                f"[debug] throttled {domain}, "
-                                f"sleeping {current_sleep}s",
-                                file=sys.stderr,
-                            )
-                        sleep_before = True
-                        continue
-                    current_sleep = args.sleep
-                    break
-
-                if status in ("available", "taken"):
-                    cache[domain] = (status, reason)
+        for batch, pending in iter_batches(words, cache, args.concurrency):
+            results = {}
+            if pending:
+                results, current_sleep = lookup_batch(
+                    executor, pending, args, not first, current_sleep, stop
+                )
+                for domain, result in results.items():
+                    if result[0] in ("available", "taken"):
+                        cache[pending[domain]] = (domain, result)
                 first = False
-            writer.writerow([word, domain, status, reason])
-            save_checkpoint(args.checkpoint, row_idx, word)
+            for row_idx, word, domain, result in batch:
+                status, reason = result or results[domain]
+                out_handle.write(format_row(word, domain, status, reason))
+                last_row = (row_idx, word)
+                unsaved_rows += 1
+                if unsaved_rows >= args.checkpoint_every:
+                    out_handle.flush()
+                    save_checkpoint(checkpoint, row_idx, word)
+                    unsaved_rows = 0
     finally:
+        if unsaved_rows:
+            out_handle.flush()
+            save_checkpoint(checkpoint, *last_row)
+        if executor is not None:
+            stop.set()
+            executor.shutdown(wait=False)
+        if checkpoint is not None:
+            checkpoint.close()
         if close_out:
             out_handle.close()
 